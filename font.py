@@ -1,5 +1,7 @@
 # pico_project/font.py - Basic 8x8 Bitmap Font
 
+from micropython import const
+
 # Each character is represented by 8 bytes (8 rows of 8 pixels).
 # A '1' bit means foreground color, '0' means background color.
 
@@ -198,8 +200,18 @@ FONT_8X8 = {
     0xFF: [0xFF, 0x81, 0x81, 0x81, 0x81, 0x81, 0x81, 0xFF],
 }
 
-FONT_WIDTH = 8
-FONT_HEIGHT = 8
+# Store each glyph as bytes so the rasterizer can read it through a viper ptr8
+for _code in FONT_8X8:
+    FONT_8X8[_code] = bytes(FONT_8X8[_code])
+
+# Flat bitmap of glyphs 32..126 followed by the default glyph, 8 bytes each,
+# so row rasterizers can index glyph (code - FONT_FIRST_CHAR) * 8 directly
+FONT_FIRST_CHAR = const(32)
+FONT_DEFAULT_INDEX = const(95) # Position of the default glyph in FONT_BITMAP
+FONT_BITMAP = b''.join([FONT_8X8.get(_code, FONT_8X8[0xFF]) for _code in range(32, 127)]) + FONT_8X8[0xFF]
+
+FONT_WIDTH = const(8)
+FONT_HEIGHT = const(8)
 
 def get_char_bytes(char):
     """Get the 8-byte bitmap for a character, or a default if not found."""
@@ -1,19 +1,66 @@
 # pico_project/graphics.py - Basic Graphics Drawing Functions
 
+import array
 import ustruct
+import micropython
+from micropython import const
 import font # Import the font definitions
 
 # Screen and Font Dimensions (Pixel-based)
-SCREEN_WIDTH_PX = 320 # Assuming ILI9488 is 320x320
-SCREEN_HEIGHT_PX = 320
-CHAR_WIDTH_PX = font.FONT_WIDTH
-CHAR_HEIGHT_PX = font.FONT_HEIGHT
-SCREEN_CHAR_WIDTH = SCREEN_WIDTH_PX // CHAR_WIDTH_PX # 40
-SCREEN_CHAR_HEIGHT = SCREEN_HEIGHT_PX // CHAR_HEIGHT_PX # 40
+# const() lets the compiler inline these into this module's drawing code.
+SCREEN_WIDTH_PX = const(320) # Assuming ILI9488 is 320x320
+SCREEN_HEIGHT_PX = const(320)
+CHAR_WIDTH_PX = const(8)  # Must match font.FONT_WIDTH
+CHAR_HEIGHT_PX = const(8) # Must match font.FONT_HEIGHT
+SCREEN_CHAR_WIDTH = const(SCREEN_WIDTH_PX // CHAR_WIDTH_PX) # 40
+SCREEN_CHAR_HEIGHT = const(SCREEN_HEIGHT_PX // CHAR_HEIGHT_PX) # 40
 
-# Pre-pack common colors if needed, or do it dynamically
-# COLOR_BLACK_BYTES = ustruct.pack(">H", 0x0000)
-# COLOR_WHITE_BYTES = ustruct.pack(">H", 0xFFFF)
+# Reused 8x8 RGB565 glyph buffer (64 pixels * 2 bytes/pixel = 128 bytes)
+_glyph_buffer = bytearray(CHAR_WIDTH_PX * CHAR_HEIGHT_PX * 2)
+
+# Zero-copy view of the flat font table; glyph g starts at byte g * 8
+_font_view = memoryview(font.FONT_BITMAP)
+
+# Byte offset into FONT_BITMAP for every 8-bit code, with unmapped codes
+# pointing at the default glyph, so lookups need no range check or multiply
+_GLYPH_OFFSET = array.array('H', [
+    (code - font.FONT_FIRST_CHAR) * 8
+    if font.FONT_FIRST_CHAR <= code < font.FONT_FIRST_CHAR + font.FONT_DEFAULT_INDEX
+    else font.FONT_DEFAULT_INDEX * 8
+    for code in range(256)])
+
+def _glyph_bytes(code):
+    """Returns the 8-byte bitmap view for an ASCII code (default glyph if unmapped).
+
+    Used to rasterize the glyph atlas straight from the flat font table.
+    """
+    offset = _GLYPH_OFFSET[code & 0xFF]
+    return _font_view[offset:offset + 8]
+
+def _swap16(color_rgb565):
+    """Byte-swap an RGB565 value so a little-endian store emits it big-endian."""
+    return ((color_rgb565 & 0xFF) << 8) | (color_rgb565 >> 8)
+
+@micropython.viper
+def _raster_glyph(out: ptr32, glyph: ptr8, fg: int, bg: int):
+    """
+    Expands an 8x8 glyph bitmap into RGB565 pixels, two pixels per 32-bit store.
+
+    Args:
+        out: 128-byte destination buffer.
+        glyph: 8 row bytes, MSB is the leftmost pixel.
+        fg, bg: Byte-swapped RGB565 colors (see _swap16).
+    """
+    i = 0
+    row = 0
+    while row < 8:
+        b = glyph[row]
+        out[i] = (fg if b & 0x80 else bg) | ((fg if b & 0x40 else bg) << 16)
+        out[i + 1] = (fg if b & 0x20 else bg) | ((fg if b & 0x10 else bg) << 16)
+        out[i + 2] = (fg if b & 0x08 else bg) | ((fg if b & 0x04 else bg) << 16)
+        out[i + 3] = (fg if b & 0x02 else bg) | ((fg if b & 0x01 else bg) << 16)
+        i += 4
+        row += 1
 
 def draw_char(display, char, x_pixel, y_pixel, fg_color_rgb565, bg_color_rgb565):
     """
@@ -30,33 +77,126 @@ def draw_char(display, char, x_pixel, y_pixel, fg_color_rgb565, bg_color_rgb565)
     # Get the 8-byte bitmap for the character
     char_bytes = font.get_char_bytes(char)
 
-    # Pack colors into 2-byte big-endian format
-    fg_bytes = ustruct.pack(">H", fg_color_rgb565)
-    bg_bytes = ustruct.pack(">H", bg_color_rgb565)
-
-    # Create a buffer for the 8x8 pixel data (64 pixels * 2 bytes/pixel = 128 bytes)
-    pixel_buffer = bytearray(font.FONT_WIDTH * font.FONT_HEIGHT * 2)
-    buffer_idx = 0
-
-    # Iterate through each row (byte) of the character bitmap
-    for row_byte in char_bytes:
-        # Iterate through each bit (pixel) in the row byte (MSB first)
-        for col_bit in range(font.FONT_WIDTH -1, -1, -1):
-            if (row_byte >> col_bit) & 1:
-                # Bit is 1: Use foreground color
-                pixel_buffer[buffer_idx : buffer_idx + 2] = fg_bytes
-            else:
-                # Bit is 0: Use background color
-                pixel_buffer[buffer_idx : buffer_idx + 2] = bg_bytes
-            buffer_idx += 2
+    # Expand the bitmap into the reused pixel buffer (native code, 32 word stores)
+    _raster_glyph(_glyph_buffer, char_bytes,
+                  _swap16(fg_color_rgb565), _swap16(bg_color_rgb565))
 
     # Set the drawing window on the display
     display.set_window(x_pixel, y_pixel,
-                       x_pixel + font.FONT_WIDTH - 1,
-                       y_pixel + font.FONT_HEIGHT - 1)
+                       x_pixel + CHAR_WIDTH_PX - 1,
+                       y_pixel + CHAR_HEIGHT_PX - 1)
 
     # Write the prepared pixel buffer to the display
-    display.write_pixels(pixel_buffer)
+    display.write_pixels(_glyph_buffer)
+
+# --- Glyph Atlas ---
+# Every printable ASCII glyph pre-rasterized in a normal and an inverted
+# color pair, so drawing a cell is a zero-copy slice of one flat buffer.
+GLYPH_FIRST = const(32)  # ' '
+GLYPH_COUNT = const(95)  # ' ' .. '~'
+GLYPH_BYTES = const(CHAR_WIDTH_PX * CHAR_HEIGHT_PX * 2) # 128 bytes per RGB565 glyph
+
+def build_glyph_atlas(fg_color_rgb565, bg_color_rgb565):
+    """
+    Pre-rasterizes printable ASCII into a flat RGB565 atlas.
+
+    Glyph `code` is stored at ((code - GLYPH_FIRST) * 2 + inverted) * GLYPH_BYTES,
+    where inverted=1 holds the glyph with foreground and background swapped.
+
+    Returns:
+        memoryview: View over the atlas bytearray (~24 KB), for copy-free slicing.
+    """
+    atlas = memoryview(bytearray(GLYPH_COUNT * 2 * GLYPH_BYTES))
+    fg = _swap16(fg_color_rgb565)
+    bg = _swap16(bg_color_rgb565)
+    offset = 0
+    for code in range(GLYPH_FIRST, GLYPH_FIRST + GLYPH_COUNT):
+        char_bytes = _glyph_bytes(code)
+        _raster_glyph(atlas[offset:offset + GLYPH_BYTES], char_bytes, fg, bg)
+        offset += GLYPH_BYTES
+        _raster_glyph(atlas[offset:offset + GLYPH_BYTES], char_bytes, bg, fg)
+        offset += GLYPH_BYTES
+    return atlas
+
+# Two reused bands for one text row of glyphs each (320 x 8 pixels RGB565 =
+# 5 KB). Rows alternate between them, so the next row can be rasterized while
+# the previous one is still going out by DMA (Display.write_pixels(wait=False)).
+_row_buffers = (bytearray(SCREEN_WIDTH_PX * CHAR_HEIGHT_PX * 2),
+                bytearray(SCREEN_WIDTH_PX * CHAR_HEIGHT_PX * 2))
+_row_views = (memoryview(_row_buffers[0]), memoryview(_row_buffers[1]))
+_band = 0 # Index of the band to fill next
+
+def _next_band():
+    """Returns the index of the band not used by the last (possibly in-flight) row."""
+    global _band
+    _band ^= 1
+    return _band
+
+@micropython.viper
+def _blit_atlas_row(out: ptr32, atlas: ptr32, codes: ptr8, count: int, inverted_index: int):
+    """
+    Copies `count` atlas glyphs side by side into a row band `count` cells wide.
+
+    Each glyph is 32 words (8 rows of 4 words); the band's pixel rows are
+    count * 4 words apart. The cell at inverted_index uses the inverted glyph.
+    """
+    row_words = count * 4
+    i = 0
+    while i < count:
+        src = ((codes[i] - 32) * 2 + (1 if i == inverted_index else 0)) * 32
+        dst = i * 4
+        y = 0
+        while y < 8:
+            out[dst] = atlas[src]
+            out[dst + 1] = atlas[src + 1]
+            out[dst + 2] = atlas[src + 2]
+            out[dst + 3] = atlas[src + 3]
+            src += 4
+            dst += row_words
+            y += 1
+        i += 1
+
+# Trailing blank cells at least this long are sent as a solid fill, not glyphs
+MIN_FILL_RUN = const(4)
+
+@micropython.viper
+def _trailing_spaces(codes: ptr8, count: int, inverted_index: int) -> int:
+    """Number of spaces at the end of `codes`, stopping at the inverted cell."""
+    i = count
+    while i > 0 and codes[i - 1] == 32 and i - 1 != inverted_index:
+        i -= 1
+    return count - i
+
+def draw_cached_text(display, atlas, codes, inverted_index, x_pixel, y_pixel, bg_color_rgb565=None):
+    """
+    Draws a run of cells from the glyph atlas with a single window + SPI write.
+
+    Args:
+        display: The initialized Display object.
+        atlas: memoryview returned by build_glyph_atlas().
+        codes: Bytes-like run of ASCII codes (32..126), at most SCREEN_CHAR_WIDTH long.
+        inverted_index: Index within `codes` drawn inverted (the cursor), or -1.
+        x_pixel, y_pixel: Top-left corner of the first cell.
+        bg_color_rgb565: The atlas background color. When given, a trailing run
+            of at least MIN_FILL_RUN spaces is sent with display.fill_rect()
+            instead of being blitted glyph by glyph.
+    """
+    count = len(codes)
+    if bg_color_rgb565 is not None:
+        blank = _trailing_spaces(codes, count, inverted_index)
+        if blank >= MIN_FILL_RUN:
+            count -= blank
+            display.fill_rect(x_pixel + count * CHAR_WIDTH_PX, y_pixel,
+                              blank * CHAR_WIDTH_PX, CHAR_HEIGHT_PX,
+                              bg_color_rgb565, False)
+            if not count:
+                return
+    band = _next_band()
+    _blit_atlas_row(_row_buffers[band], atlas, codes, count, inverted_index)
+    display.set_window(x_pixel, y_pixel,
+                       x_pixel + count * CHAR_WIDTH_PX - 1,
+                       y_pixel + CHAR_HEIGHT_PX - 1)
+    display.write_pixels(_row_views[band][:count * GLYPH_BYTES], False)
 
 def clear_rect(display, x_pixel, y_pixel, width_px, height_px, color_rgb565):
     """
@@ -86,37 +226,10 @@ def clear_rect(display, x_pixel, y_pixel, width_px, height_px, color_rgb565):
     # Prepare the color buffer for a single pixel
     color_bytes = ustruct.pack(">H", color_rgb565)
 
-    # Calculate the total number of pixels
-    num_pixels = width_px * height_px
-
-    # Create a buffer for one row or a chunk at a time to avoid large allocations
-    # Let's send pixel data pixel by pixel for simplicity here,
-    # although buffering might be faster if memory allows.
-    # Optimization: Create a buffer for the color data and write it repeatedly
-    # For maximum memory efficiency on Pico, write pixel by pixel if needed.
-    # display.write_pixels() likely expects a buffer, so let's prepare a small one.
-
-    # Simple approach: Write color for each pixel (less efficient but simple)
-    # This might be slow. A buffered approach is better.
-    # Let's try writing the color bytes repeatedly using write_pixels.
-    # write_pixels takes a buffer. We can send the same 2-byte color buffer many times.
-    # However, the underlying driver might expect a buffer containing all pixel data.
-    # Let's check ili9488.py or assume write_pixels can handle repeated small writes
-    # if display._write exists or similar low-level function.
-    # If write_pixels needs the full buffer:
-    # chunk_size = 512 # bytes, adjust based on memory
-    # full_buffer_size = num_pixels * 2
-    # ... logic to fill and send chunks ...
-
-    # Alternative: Use display.fill_rect if available, otherwise implement manually.
-    # Assuming fill_rect is not standard, we implement via set_window + write_pixels.
-
-    # Prepare a buffer for a single row might be a good compromise
-    row_buffer_size = width_px * 2 # bytes per row
-    if row_buffer_size > 0:
-        row_buffer = bytearray(width_px * 2)
-        for i in range(0, width_px * 2, 2):
-            row_buffer[i:i+2] = color_bytes
+    # One row of the fill color, built by C-level bytes repetition rather than
+    # a Python loop of 2-byte slice assignments
+    if width_px > 0:
+        row_buffer = color_bytes * width_px
 
         # Write the row buffer repeatedly for each row
         for _ in range(height_px):
@@ -129,12 +242,54 @@ def clear_rect(display, x_pixel, y_pixel, width_px, height_px, color_rgb565):
 
 # --- Optional Helper Functions (Can be added later) ---
 
+@micropython.viper
+def _raster_row(out: ptr32, bitmap: ptr8, offsets: ptr16, codes: ptr8, count: int, fg: int, bg: int):
+    """
+    Rasterizes `count` characters side by side into a row band, straight from
+    font.FONT_BITMAP. Colors are byte-swapped RGB565 (see _swap16); each
+    glyph's bitmap offset comes from _GLYPH_OFFSET, which maps codes outside
+    32..126 to the default glyph.
+    """
+    row_words = count * 4
+    i = 0
+    while i < count:
+        src = offsets[codes[i]]
+        dst = i * 4
+        y = 0
+        while y < 8:
+            b = bitmap[src + y]
+            out[dst] = (fg if b & 0x80 else bg) | ((fg if b & 0x40 else bg) << 16)
+            out[dst + 1] = (fg if b & 0x20 else bg) | ((fg if b & 0x10 else bg) << 16)
+            out[dst + 2] = (fg if b & 0x08 else bg) | ((fg if b & 0x04 else bg) << 16)
+            out[dst + 3] = (fg if b & 0x02 else bg) | ((fg if b & 0x01 else bg) << 16)
+            dst += row_words
+            y += 1
+        i += 1
+
 def draw_string(display, text, x_pixel, y_pixel, fg_color_rgb565, bg_color_rgb565):
-    current_x = x_pixel
-    for char in text:
-        # Need to import font if not already globally available in this scope
-        draw_char(display, char, current_x, y_pixel, fg_color_rgb565, bg_color_rgb565)
-        current_x += font.FONT_WIDTH # Assuming font is imported and FONT_WIDTH is accessible
+    """
+    Draws a line of text, rasterized a full row band at a time.
+
+    Each run of up to SCREEN_CHAR_WIDTH characters is sent with one window and
+    one SPI write instead of one transaction per character.
+
+    Args:
+        text: str, or a bytes-like of ASCII codes (used without conversion).
+    """
+    codes = text.encode() if isinstance(text, str) else text
+    fg = _swap16(fg_color_rgb565)
+    bg = _swap16(bg_color_rgb565)
+    start = 0
+    while start < len(codes):
+        count = min(len(codes) - start, SCREEN_CHAR_WIDTH)
+        band = _next_band()
+        _raster_row(_row_buffers[band], font.FONT_BITMAP, _GLYPH_OFFSET, memoryview(codes)[start:start + count], count, fg, bg)
+        display.set_window(x_pixel, y_pixel,
+                           x_pixel + count * CHAR_WIDTH_PX - 1,
+                           y_pixel + CHAR_HEIGHT_PX - 1)
+        display.write_pixels(_row_views[band][:count * GLYPH_BYTES], False)
+        x_pixel += count * CHAR_WIDTH_PX
+        start += count
 
 def clear_screen(display, color_rgb565):
     display.fill_screen(color_rgb565) 
\ No newline at end of file
@@ -1,8 +1,74 @@
 # pico_project/ili9488.py - ILI9488 Driver for MicroPython
 import machine
+import micropython
+import sys
 import time
 import ustruct
 
+# DMA controller access. The rp2 port also runs on the RP2350, whose SPI
+# registers and DREQ numbers differ from the RP2040 values below, so DMA is
+# only used when the chip is confirmed to be an RP2040.
+try:
+    import rp2
+except ImportError:
+    rp2 = None
+if rp2 is not None and 'RP2040' not in getattr(sys.implementation, '_machine', ''):
+    rp2 = None
+
+# Shared solid-color buffer for fill_rect: one 320-pixel display row (640 bytes) per SPI write
+_FILL_BUF_PIXELS = 320
+_FILL_BUF = bytearray(_FILL_BUF_PIXELS * 2)
+_fill_buf_color = None # RGB565 color currently held in _FILL_BUF
+
+# RP2040 PL022 SPI registers used to stream fills by DMA, indexed by SPI bus id
+_SPI_BASE = (0x4003C000, 0x40040000)
+_SSPDR = 0x08   # Data register (TX/RX FIFO)
+_SSPSR = 0x0C   # Status register
+_SSPICR = 0x20  # Interrupt clear register
+_SSPSR_RNE = 0x04 # RX FIFO not empty
+_SSPSR_BSY = 0x10 # Still shifting a frame out
+_DREQ_SPI_TX = (16, 18) # RP2040 DMA pacing request for each bus's TX FIFO
+
+@micropython.viper
+def _fill16(buf: ptr16, count: int, value: int):
+    """Stores `value` into `count` consecutive 16-bit words of buf."""
+    i = 0
+    while i < count:
+        buf[i] = value
+        i += 1
+
+# SPI clock used while sending the power-up sequence, before switching to the
+# Display's (pixel) baudrate
+_INIT_BAUDRATE = 10_000_000
+
+# ILI9488 power-up sequence: (command, data bytes or None, delay after in ms)
+_INIT_SEQUENCE = (
+    # Key Settings
+    (0x36, b"\x40", 0), # MADCTL: Memory Access Control - Portrait (MY=0,MX=1,MV=0), RGB
+    (0x3A, b"\x55", 0), # COLMOD: Pixel Format Set - 16 bits/pixel (RGB565)
+
+    # Interface & Display Control
+    (0xB0, b"\x80", 0), # Interface Mode Control
+    (0xB4, b"\x00", 0), # Display Inversion Control
+    (0xB6, b"\x80\x02\x3B", 0), # Display Function Control
+    (0xB7, b"\xC6", 0), # Entry Mode Set
+
+    # Power Controls
+    (0xC0, b"\x10\x10", 0), # Power Control 1
+    (0xC1, b"\x41", 0),     # Power Control 2
+    (0xC5, b"\x00\x18", 0), # VCOM Control 1
+
+    # Gamma Settings
+    (0xE0, bytes([0x0F, 0x1F, 0x1C, 0x0C, 0x0F, 0x08, 0x48, 0x98, 0x37, 0x0A, 0x13, 0x04, 0x11, 0x0D, 0x00]), 0), # PGAMCTRL
+    (0xE1, bytes([0x0F, 0x32, 0x2E, 0x0B, 0x0D, 0x05, 0x47, 0x75, 0x37, 0x06, 0x10, 0x03, 0x24, 0x20, 0x00]), 0), # NGAMCTRL
+
+    # Tearing Effect Line OFF
+    (0x35, b"\x00", 0),
+
+    (0x11, None, 120), # SLPOUT: Sleep Out (120ms required before further commands)
+    (0x29, None, 20),  # DISPON: Display ON
+)
+
 class Display:
     """
     ILI9488 Display Driver for Raspberry Pi Pico.
@@ -10,15 +76,17 @@ class Display:
     Handles SPI communication, initialization, and basic drawing commands.
     """
     def __init__(self, spi_bus, cs_pin, dc_pin, rst_pin, bl_pin, sck_pin, mosi_pin,
-                 width=320, height=320, baudrate=20_000_000):
+                 width=320, height=320, baudrate=40_000_000):
         self.width = width
         self.height = height
         # Internal state for scrolling
         self._vsa_height = height # Assume full screen scroll initially
         self._current_scroll_line = 0
+        self._scroll_buf = bytearray(2) # Reused VSCSAD argument
 
         self.spi_bus_id = spi_bus
         self.baudrate = baudrate
+        self._cmd_buf = bytearray(1) # Reused command byte buffer
 
         # Initialize GPIO pins
         self.cs = machine.Pin(cs_pin, machine.Pin.OUT, value=1) # CS inactive (high)
@@ -30,35 +98,89 @@ class Display:
         self.mosi = machine.Pin(mosi_pin)
         print(f"Display pins initialized: CS={cs_pin}, DC={dc_pin}, RST={rst_pin}, BL={bl_pin}")
 
-        # Initialize SPI
-        self.spi = machine.SPI(self.spi_bus_id, baudrate=self.baudrate,
+        # Initialize SPI. The register setup runs at a conservative clock; the
+        # requested (pixel) clock is applied once the controller is awake.
+        init_baudrate = min(self.baudrate, _INIT_BAUDRATE)
+        self.spi = machine.SPI(self.spi_bus_id, baudrate=init_baudrate,
                                sck=self.sck, mosi=self.mosi,
                                polarity=0, phase=0)
-        print(f"SPI(bus={self.spi_bus_id}, baudrate={self.baudrate}, sck={sck_pin}, mosi={mosi_pin}) initialized.")
+        print(f"SPI(bus={self.spi_bus_id}, baudrate={init_baudrate}, sck={sck_pin}, mosi={mosi_pin}) initialized.")
+
+        # Optional DMA channel for solid fills: it re-reads one color from a
+        # 4-byte ring into the SPI TX FIFO, so no screen-sized buffer is needed
+        self._dma = None
+        self._dma_busy = False
+        self._dma_color = bytearray(4)
+        if rp2 is not None:
+            try:
+                self._dma = rp2.DMA()
+                self._dma_ctrl = self._dma.pack_ctrl(size=0, inc_read=True, inc_write=False,
+                                                     ring_size=2, ring_sel=False,
+                                                     treq_sel=_DREQ_SPI_TX[spi_bus])
+                # Same pacing, but walking a caller's pixel buffer once
+                self._dma_ctrl_stream = self._dma.pack_ctrl(size=0, inc_read=True, inc_write=False,
+                                                            treq_sel=_DREQ_SPI_TX[spi_bus])
+            except Exception as e:
+                print(f"DMA unavailable, fills use blocking SPI writes: {e}")
+                self._dma = None
 
         # Perform hardware reset and initialization
         self._hwreset()
         self.init_display()
+        self.spi.init(baudrate=self.baudrate) # Full speed for pixel traffic
+        print(f"SPI baudrate raised to {self.baudrate} for pixel data.")
         self.backlight_on()
 
+    def wait_dma(self):
+        """
+        Block until a fill started with fill_rect(..., wait=False) has fully left
+        the SPI port, then release CS. Returns immediately if none is running.
+        """
+        if not self._dma_busy:
+            return
+        while self._dma.active():
+            pass
+        base = _SPI_BASE[self.spi_bus_id]
+        while machine.mem32[base + _SSPSR] & _SSPSR_BSY:
+            pass
+        # Discard the RX bytes clocked in during the transfer and clear the
+        # overrun flag, so the next machine.SPI write starts clean
+        while machine.mem32[base + _SSPSR] & _SSPSR_RNE:
+            machine.mem32[base + _SSPDR]
+        machine.mem32[base + _SSPICR] = 1
+        self.cs.value(1) # Chip select inactive
+        self._dma_busy = False
+
     def _wcmd(self, cmd_byte):
         """Send a command byte."""
+        if self._dma_busy:
+            self.wait_dma()
+        self._cmd_buf[0] = cmd_byte
         self.dc.value(0) # Command mode
         self.cs.value(0) # Select chip
-        self.spi.write(bytes([cmd_byte]))
+        self.spi.write(self._cmd_buf)
         self.cs.value(1) # Deselect chip
 
     def _wdata(self, data_bytes):
         """Send a data byte or sequence of bytes."""
+        if self._dma_busy:
+            self.wait_dma()
         self.dc.value(1) # Data mode
         self.cs.value(0) # Select chip
-        self.spi.write(data_bytes if isinstance(data_bytes, bytes) else bytes([data_bytes]))
+        self.spi.write(bytes([data_bytes]) if isinstance(data_bytes, int) else data_bytes)
         self.cs.value(1) # Deselect chip
 
     def _wcd(self, cmd_byte, data_bytes):
-        """Send a command byte followed by data byte(s)."""
-        self._wcmd(cmd_byte)
-        self._wdata(data_bytes)
+        """Send a command byte followed by data byte(s), CS held low across both."""
+        if self._dma_busy:
+            self.wait_dma()
+        self._cmd_buf[0] = cmd_byte
+        self.cs.value(0) # Select chip once for the whole sequence
+        self.dc.value(0) # Command mode
+        self.spi.write(self._cmd_buf)
+        self.dc.value(1) # Data mode
+        self.spi.write(bytes([data_bytes]) if isinstance(data_bytes, int) else data_bytes)
+        self.cs.value(1) # Deselect chip
 
     def _hwreset(self):
         """Perform hardware reset."""
@@ -71,35 +193,21 @@ class Display:
     def init_display(self):
         """Send the initialization sequence to the ILI9488 controller."""
         print("Sending ILI9488 Initialization Sequence...")
-        # Key Settings
-        self._wcd(0x36, 0x40) # MADCTL: Memory Access Control - Portrait (MY=0,MX=1,MV=0), RGB
-        self._wcd(0x3A, 0x55) # COLMOD: Pixel Format Set - 16 bits/pixel (RGB565)
-
-        # Interface & Display Control
-        self._wcd(0xB0, 0x80) # Interface Mode Control
-        self._wcd(0xB4, 0x00) # Display Inversion Control
-        self._wcd(0xB6, bytes([0x80, 0x02, 0x3B])) # Display Function Control
-        self._wcd(0xB7, 0xC6) # Entry Mode Set
-
-        # Power Controls
-        self._wcd(0xC0, bytes([0x10, 0x10])) # Power Control 1
-        self._wcd(0xC1, 0x41)               # Power Control 2
-        self._wcd(0xC5, bytes([0x00, 0x18])) # VCOM Control 1
-
-        # Gamma Settings
-        self._wcd(0xE0, bytes([0x0F, 0x1F, 0x1C, 0x0C, 0x0F, 0x08, 0x48, 0x98, 0x37, 0x0A, 0x13, 0x04, 0x11, 0x0D, 0x00])) # PGAMCTRL
-        self._wcd(0xE1, bytes([0x0F, 0x32, 0x2E, 0x0B, 0x0D, 0x05, 0x47, 0x75, 0x37, 0x06, 0x10, 0x03, 0x24, 0x20, 0x00])) # NGAMCTRL
-
-        # Tearing Effect Line OFF
-        self._wcd(0x35, 0x00)
-
-        # Exit Sleep Mode
-        self._wcmd(0x11)      # SLPOUT: Sleep Out
-        time.sleep(0.12) # 120ms delay required after SLPOUT
-
-        # Turn Display ON
-        self._wcmd(0x29)      # DISPON: Display ON
-        time.sleep(0.02) # 20ms delay after DISPON
+        spi_write = self.spi.write
+        cs = self.cs
+        dc = self.dc
+        cmd_buf = self._cmd_buf
+        for cmd, data, delay_ms in _INIT_SEQUENCE:
+            cmd_buf[0] = cmd
+            cs.value(0) # One CS assertion per command + data pair
+            dc.value(0) # Command mode
+            spi_write(cmd_buf)
+            if data:
+                dc.value(1) # Data mode
+                spi_write(data)
+            cs.value(1)
+            if delay_ms:
+                time.sleep_ms(delay_ms)
 
         # Default scroll setup (can be overridden later)
         # self.define_scroll_area(0, self.height, 0) # Let main.py call this
@@ -125,59 +233,102 @@ class Display:
         x1 = max(0, min(self.width - 1, x1))
         y1 = max(0, min(self.height - 1, y1))
 
-        self._wcmd(0x2A) # CASET (Column Address Set)
-        self._wdata(ustruct.pack(">HH", x0, x1))
+        self._wcd(0x2A, ustruct.pack(">HH", x0, x1)) # CASET (Column Address Set)
+        self._wcd(0x2B, ustruct.pack(">HH", y0, y1)) # RASET (Row Address Set)
 
-        self._wcmd(0x2B) # RASET (Row Address Set)
-        self._wdata(ustruct.pack(">HH", y0, y1))
-
-    def write_pixels(self, pixel_data):
+    def write_pixels(self, pixel_data, wait=True):
         """
         Write raw pixel data (bytes) to the display RAM.
         Assumes set_window() has been called previously.
         Sends the RAMWR command before writing data.
+
+        With wait=False and a DMA channel available, the data is streamed by
+        DMA and this returns immediately; pixel_data must then stay unchanged
+        until the next display call (or wait_dma()) has finished the transfer.
         """
-        self._wcmd(0x2C) # RAMWR (Memory Write)
+        if self._dma_busy:
+            self.wait_dma()
+        self._cmd_buf[0] = 0x2C # RAMWR (Memory Write)
+        self.cs.value(0) # Chip select active for command and pixel stream
+        self.dc.value(0) # Command mode
+        self.spi.write(self._cmd_buf)
         self.dc.value(1) # Data mode
-        self.cs.value(0) # Chip select active
+        if not wait and self._dma is not None:
+            self._dma.config(read=pixel_data,
+                             write=_SPI_BASE[self.spi_bus_id] + _SSPDR,
+                             count=len(pixel_data),
+                             ctrl=self._dma_ctrl_stream, trigger=True)
+            self._dma_busy = True # wait_dma() raises CS
+            return
         self.spi.write(pixel_data)
         self.cs.value(1) # Chip select inactive
 
-    def fill_rect(self, x, y, w, h, color_rgb565):
-        """Fill a rectangular area with a specified color."""
+    def fill_rect(self, x, y, w, h, color_rgb565, wait=True):
+        """
+        Fill a rectangular area with a specified color.
+
+        When a DMA channel is available the pixels are streamed by DMA; with
+        wait=False this returns as soon as the transfer starts, and the next
+        display call (or wait_dma()) finishes it.
+        """
+        global _fill_buf_color
         self.set_window(x, y, x + w - 1, y + h - 1)
-        color_bytes = ustruct.pack(">H", color_rgb565)
         num_pixels = w * h
         bytes_per_pixel = 2
 
-        # Prepare RAMWR command
-        self._wcmd(0x2C)
-        self.dc.value(1) # Data mode
+        if self._dma is not None:
+            ustruct.pack_into(">HH", self._dma_color, 0, color_rgb565, color_rgb565)
+            self._cmd_buf[0] = 0x2C # RAMWR
+            self.cs.value(0) # Held low until wait_dma()
+            self.dc.value(0) # Command mode
+            self.spi.write(self._cmd_buf)
+            self.dc.value(1) # Data mode
+            self._dma.config(read=self._dma_color,
+                             write=_SPI_BASE[self.spi_bus_id] + _SSPDR,
+                             count=num_pixels * bytes_per_pixel,
+                             ctrl=self._dma_ctrl, trigger=True)
+            self._dma_busy = True
+            if wait:
+                self.wait_dma()
+            return
+
+        # Refill the shared buffer only when the color changes. The value is
+        # byte-swapped so the little-endian 16-bit stores land big-endian.
+        if color_rgb565 != _fill_buf_color:
+            _fill16(_FILL_BUF, _FILL_BUF_PIXELS,
+                    ((color_rgb565 & 0xFF) << 8) | (color_rgb565 >> 8))
+            _fill_buf_color = color_rgb565
+
+        # RAMWR command, then keep CS low for the whole pixel stream
+        self._cmd_buf[0] = 0x2C
         self.cs.value(0) # Chip select active
+        self.dc.value(0) # Command mode
+        self.spi.write(self._cmd_buf)
+        self.dc.value(1) # Data mode
 
-        # Use a buffer for potentially faster SPI transfers
-        buffer_size_pixels = 128 # Number of pixels per buffer write
-        buffer_size_bytes = buffer_size_pixels * bytes_per_pixel
-        pixel_buffer = bytearray(buffer_size_bytes)
-        # Fill the buffer with the target color
-        for i in range(0, buffer_size_bytes, bytes_per_pixel):
-            pixel_buffer[i:i+bytes_per_pixel] = color_bytes
+        # Send the preallocated color buffer one display row per chunk; the
+        # memoryview makes the final partial slice copy-free
+        buffer_size_pixels = _FILL_BUF_PIXELS # Number of pixels per buffer write
+        pixel_buffer = memoryview(_FILL_BUF)
 
+        # Hot names as locals; a conditional instead of the min() builtin
+        spi_write = self.spi.write
         pixels_sent = 0
         while pixels_sent < num_pixels:
-            pixels_to_send = min(buffer_size_pixels, num_pixels - pixels_sent)
-            bytes_to_send = pixels_to_send * bytes_per_pixel
+            remaining = num_pixels - pixels_sent
+            pixels_to_send = remaining if remaining < buffer_size_pixels else buffer_size_pixels
             # Send the appropriate portion of the buffer
-            self.spi.write(pixel_buffer[:bytes_to_send])
+            spi_write(pixel_buffer[:pixels_to_send * bytes_per_pixel])
             pixels_sent += pixels_to_send
 
         self.cs.value(1) # Chip select inactive
 
-    def fill_screen(self, color_rgb565):
-        """Fill the entire screen with a specified color."""
+    def fill_screen(self, color_rgb565, wait=True):
+        """Fill the entire screen with a specified color (see fill_rect for wait)."""
         print(f"Filling screen with color {hex(color_rgb565)}...")
-        self.fill_rect(0, 0, self.width, self.height, color_rgb565)
-        print("Screen fill complete.")
+        self.fill_rect(0, 0, self.width, self.height, color_rgb565, wait)
+        if wait:
+            print("Screen fill complete.")
 
     # --- Hardware Scrolling Methods ---
     def define_scroll_area(self, tfa, vsa, bfa):
@@ -201,8 +352,8 @@ class Display:
         line = line % self._vsa_height # Wrap around the scroll area
         self._current_scroll_line = line
         # print(f"Setting scroll start line to: {line}") # Debug print
-        data = ustruct.pack(">H", line)
-        self._wcd(0x37, data)
+        ustruct.pack_into(">H", self._scroll_buf, 0, line)
+        self._wcd(0x37, self._scroll_buf)
 
     def get_scroll_start(self):
         """ Returns the internally tracked current scroll line """
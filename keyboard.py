@@ -7,6 +7,9 @@ custom I2C keyboard controller (Address 0x1F) using MicroPython's
 """
 import time
 import machine
+import micropython
+from micropython import const
+from collections import deque
 
 # PicoCalc Keyboard Specifics
 PICOCALC_I2C_ADDR = 0x1F
@@ -38,9 +41,28 @@ F10 = 147
 F11 = 148      # Note: F11 not in the I2C.c switch
 F12 = 149      # Note: F12 not in the I2C.c switch
 
+# Set to 1 to log raw key events; const() compiles the logging out when 0
+DEBUG = const(0)
+
 # Command buffer for writing
 _CMD_BUF = bytearray([PICOCALC_CMD_READ_STATUS])
 
+# Pending key codes kept before the oldest is dropped
+KEY_BUFFER_SIZE = const(32)
+
+# Scans during which a second press of the same key, with no release in
+# between, is treated as contact chatter and dropped
+DEBOUNCE_TICKS = const(3)
+
+@micropython.viper
+def _debounce_tick(table: ptr8):
+    """Counts every nonzero lockout entry in the 256-byte table down by one."""
+    i = 0
+    while i < 256:
+        if table[i]:
+            table[i] = table[i] - 1
+        i += 1
+
 class PicoCalcKeyboard:
     """
     Handles communication with the PicoCalc's I2C keyboard (address 0x1F)
@@ -62,8 +84,11 @@ class PicoCalcKeyboard:
         self.address = address
         self.bus = None
         self.ctrl_held = False
-        self.key_buffer = [] # Simple list buffer
+        # FIFO with O(1) popleft (list.pop(0) shifts every queued key); the
+        # maxlen argument is positional for MicroPython's deque
+        self.key_buffer = deque((), KEY_BUFFER_SIZE)
         self.last_raw_status = None # For debugging
+        self.debounce_table = bytearray(256) # Remaining lockout ticks per raw key code
 
         try:
             # Explicitly define pins with pull-ups using passed pin numbers
@@ -252,18 +277,28 @@ class PicoCalcKeyboard:
         # Track last Enter key to avoid duplicates
         # Only process the first Enter key code (0x01) and ignore the second (0x03)
         if is_enter_key and event_type == 0x03:
-            print("Ignoring duplicate Enter key")
+            if DEBUG:
+                print("Ignoring duplicate Enter key")
+            self.debounce_table[raw_key_code] = 0 # The second code is the release
             return
         
-        # Enable this line to debug all key presses in detail
-        print(f"DEBUG RAW KEY: Status=0x{status:04X}, Type=0x{event_type:02X}, Code=0x{raw_key_code:02X}")
+        # Set DEBUG to log all key presses in detail
+        if DEBUG:
+            print(f"DEBUG RAW KEY: Status=0x{status:04X}, Type=0x{event_type:02X}, Code=0x{raw_key_code:02X}")
         
         if event_type == 1 or is_enter_key: # Key PRESS event (regular or Enter)
+            # Eager debounce: the first press goes through immediately, a repeat
+            # press before the release and within DEBOUNCE_TICKS scans is chatter
+            if self.debounce_table[raw_key_code]:
+                return
+            self.debounce_table[raw_key_code] = DEBOUNCE_TICKS
+
             # For Enter key, swap the code and type interpretation
             if is_enter_key:
                 # Use 13 (CR) as the final code for Enter
                 c = 13
-                print(f"ENTER KEY DETECTED: Raw=0x{event_type:02X}, Type=0x{raw_key_code:02X}, Using CR (13)")
+                if DEBUG:
+                    print(f"ENTER KEY DETECTED: Raw=0x{event_type:02X}, Type=0x{raw_key_code:02X}, Using CR (13)")
             else:
                 # Regular key - translate the raw code
                 c = self._translate_raw_code(raw_key_code)
@@ -277,7 +312,7 @@ class PicoCalcKeyboard:
             # Handle Break Key (Ctrl+C -> ASCII 3)
             if final_code == BreakKey:
                 print("Break key (Ctrl+C) detected!")
-                self.key_buffer.clear() # Clear buffer on break
+                self.key_buffer = deque((), KEY_BUFFER_SIZE) # Clear buffer on break (O(1), no deque.clear())
 
             # Buffer the final key code
             if final_code is not None:
@@ -299,38 +334,45 @@ class PicoCalcKeyboard:
                 self.key_buffer.append(final_code)
                 
         elif event_type == 3: # Key RELEASE event
-            # We generally don't buffer key releases
-            pass
+            # We generally don't buffer key releases, but a release ends the lockout
+            self.debounce_table[raw_key_code] = 0
 
     def scan_keyboard(self):
         """
         Performs the two-stage poll (write command, read status)
         and processes the result. Should be called periodically.
+
+        Returns:
+            bool: True if the controller reported an event (its FIFO may hold more).
         """
         if not self.bus:
             # print("Warning: scan_keyboard called but I2C bus not initialized.")
-            return
+            return False
+
+        # Age the debounce lockouts by one scan
+        _debounce_tick(self.debounce_table)
 
         # Stage 1: Write command
         if not self._write_command():
             # Failed to write command, maybe device disconnected?
             # print("DEBUG: Failed to write command in scan_keyboard") # Debug
-            time.sleep(0.01) # Small delay before next attempt
-            return # Skip reading status if write failed
+            time.sleep_ms(10) # Small delay before next attempt
+            return False # Skip reading status if write failed
 
         # Short delay between write and read? Needed by some I2C devices.
-        # Use time.sleep with milliseconds for MicroPython compatibility
-        time.sleep(0.001) # 1 millisecond delay
+        # Integer sleep_ms avoids boxing a float on every scan
+        time.sleep_ms(1) # 1 millisecond delay
 
         # Stage 2: Read status
         status = self._read_status()
 
         # --- DEBUG: Print raw status --- 
-        if status is not None: 
-            # print(f"DEBUG: Received Status = 0x{status:04X}")
-            pass
-        else:
-            print("DEBUG: Received Status = None")
+        if DEBUG:
+            if status is not None:
+                # print(f"DEBUG: Received Status = 0x{status:04X}")
+                pass
+            else:
+                print("DEBUG: Received Status = None")
         # --- END DEBUG ---
 
         # Stage 3: Decode and buffer
@@ -338,6 +380,7 @@ class PicoCalcKeyboard:
             self._decode_and_buffer(status)
         # else:
             # print("DEBUG: Failed to read status in scan_keyboard") # Debug
+        return bool(status)
 
     def has_key(self):
         """
@@ -356,7 +399,7 @@ class PicoCalcKeyboard:
             int or None: Key code (ASCII or special value) or None if buffer is empty.
         """
         if self.key_buffer:
-            return self.key_buffer.pop(0)
+            return self.key_buffer.popleft()
         else:
             return None
 
@@ -383,7 +426,7 @@ class PicoCalcKeyboard:
                      print(f"Status: 0x{self.last_raw_status:04X} -> Key: 0x{key:02X} ('{char_repr}') Ctrl: {self.ctrl_held}")
 
                 # Prevent busy-looping, C firmware implies periodic checks
-                time.sleep(0.02) # Poll roughly 50 times/sec
+                time.sleep_ms(20) # Poll roughly 50 times/sec
 
         except KeyboardInterrupt:
             print("Test stopped by user.")
@@ -1,6 +1,10 @@
 # main.py - Refactored main application using Display, Graphics, and PicoCalc Keyboard
 
 import time
+import array
+import machine
+import micropython
+from micropython import const
 from ili9488 import Display # Import the Display class
 import graphics           # Import the graphics module
 import font               # Import font definitions/dimensions
@@ -10,31 +14,40 @@ import keyboard          # Import the new PicoCalc keyboard driver
 from graphics import SCREEN_CHAR_WIDTH, SCREEN_CHAR_HEIGHT, CHAR_WIDTH_PX, CHAR_HEIGHT_PX, clear_rect
 
 # --- Display Configuration ---
-LCD_CS_PIN = 13   # Chip Select
-LCD_DC_PIN = 14   # Data/Command
-LCD_RST_PIN = 15  # Reset
-LCD_SCK_PIN = 10  # SPI Clock
-LCD_MOSI_PIN = 11 # SPI Data Out
-LCD_BL_PIN = 12   # Backlight Control (Active High)
+# Integer settings are const() so the compiler inlines them at each use.
+LCD_CS_PIN = const(13)   # Chip Select
+LCD_DC_PIN = const(14)   # Data/Command
+LCD_RST_PIN = const(15)  # Reset
+LCD_SCK_PIN = const(10)  # SPI Clock
+LCD_MOSI_PIN = const(11) # SPI Data Out
+LCD_BL_PIN = const(12)   # Backlight Control (Active High)
 
-LCD_WIDTH = 320  # Display width in pixels
-LCD_HEIGHT = 320 # Display height in pixels (Square display)
+LCD_WIDTH = const(320)  # Display width in pixels
+LCD_HEIGHT = const(320) # Display height in pixels (Square display)
 
-SPI_BUS = 1 # Use SPI1 (matches schematic pins GP10, GP11)
-SPI_BAUDRATE = 20_000_000 # SPI clock frequency
+SPI_BUS = const(1) # Use SPI1 (matches schematic pins GP10, GP11)
+SPI_BAUDRATE = const(40_000_000) # SPI clock frequency (RP2040 rounds to 31.25 MHz; drop to 20 MHz if artifacts appear)
+
+# --- Keyboard Configuration ---
+KBD_INT_PIN = None # GPIO wired to the keyboard controller's INT line (active low); None = poll
+KBD_IDLE_TIMEOUT_MS = const(50) # Scan anyway after this long without an edge (missed-IRQ fallback)
 
 # --- Color Definitions (RGB565) ---
-COLOR_BLACK = 0x0000
-COLOR_WHITE = 0xFFFF
-COLOR_RED   = 0xF800
-COLOR_GREEN = 0x07E0
-COLOR_BLUE  = 0x001F
-COLOR_CYAN  = 0x07FF
-COLOR_MAGENTA = 0xF81F
-COLOR_YELLOW = 0xFFE0
+# const() with a leading underscore keeps these file-local and lets the
+# compiler inline them instead of doing a globals lookup per use.
+_COLOR_BLACK = const(0x0000)
+_COLOR_WHITE = const(0xFFFF)
+_COLOR_RED   = const(0xF800)
+_COLOR_GREEN = const(0x07E0)
+_COLOR_BLUE  = const(0x001F)
+_COLOR_CYAN  = const(0x07FF)
+_COLOR_MAGENTA = const(0xF81F)
+_COLOR_YELLOW = const(0xFFE0)
 
 # --- Debug Configuration ---
-DEBUG_MODE = False  # Set to False for normal operation, True for debugging
+# const() folds this into each `if DEBUG_MODE:` so the compiler drops the whole
+# debug block from handle_key; it must be an int, so use 1 to enable
+DEBUG_MODE = const(0)  # 0 for normal operation, 1 for debugging
 
 print("--- Initializing Display ---")
 # Initialize the display driver
@@ -57,52 +70,117 @@ print("--- Initializing PicoCalc Keyboard ---")
 # Rename the instance to avoid conflict with the module name
 kbd = keyboard.init()  # This uses the default settings from keyboard.py
 
+# Keyboard interrupt: the ISR only raises a flag, the main loop does the I2C work
+kbd_ready = True # Scan once at startup
+def _kbd_isr(pin):
+    global kbd_ready
+    kbd_ready = True
+
+if kbd and KBD_INT_PIN is not None:
+    kbd_int = machine.Pin(KBD_INT_PIN, machine.Pin.IN, machine.Pin.PULL_UP)
+    kbd_int.irq(trigger=machine.Pin.IRQ_FALLING, handler=_kbd_isr, hard=True)
+    print(f"Keyboard INT on GP{KBD_INT_PIN}: interrupt-driven scanning.")
+
 print("--- Initializing Shell ---")
 
 # --- Shell Configuration & State ---
-screen_buffer = [[' ' for _ in range(SCREEN_CHAR_WIDTH)] for _ in range(SCREEN_CHAR_HEIGHT)]
+# Flat ring of rows holding ASCII codes. Scrolling advances top_row instead of
+# moving bytes: logical row `row` lives in buffer row (top_row + row) % SCREEN_CHAR_HEIGHT,
+# so cell (col, row) is at ROW_OFFSET[top_row + row] + col. Buffer row p is
+# always drawn at frame-memory y = p * CHAR_HEIGHT_PX; the hardware scroll
+# start (VSCSAD) tracks top_row, so buffer and panel rotate together.
+screen_buffer = bytearray(b' ' * (SCREEN_CHAR_WIDTH * SCREEN_CHAR_HEIGHT))
+BLANK_ROW = b' ' * SCREEN_CHAR_WIDTH # Reused to clear the row scrolled in at the bottom (no per-scroll allocation)
+screen_view = memoryview(screen_buffer) # Copy-free slices of the buffer
+top_row = 0 # Buffer row shown at the top of the panel
+# Buffer offset of ring slot p, doubled so top_row + row never needs a modulo
+ROW_OFFSET = array.array('H', [(p % SCREEN_CHAR_HEIGHT) * SCREEN_CHAR_WIDTH
+                               for p in range(2 * SCREEN_CHAR_HEIGHT)])
+# Pixel origin of each text column / buffer row, so drawing indexes instead of multiplying
+COL_X = array.array('H', [c * CHAR_WIDTH_PX for c in range(SCREEN_CHAR_WIDTH + 1)])
+ROW_Y = array.array('H', [r * CHAR_HEIGHT_PX for r in range(SCREEN_CHAR_HEIGHT + 1)])
+# What is currently on the glass for each cell: ASCII code, bit 7 set if drawn as the cursor.
+# Indexed like screen_buffer. Starts as spaces to match the black screen after the initial clear.
+drawn_buffer = bytearray(b' ' * (SCREEN_CHAR_WIDTH * SCREEN_CHAR_HEIGHT))
+DRAWN_CURSOR_BIT = 0x80
 cursor_col = 0
 cursor_row = 0
 PROMPT = "> " # Define the prompt string
+PROMPT_BYTES = PROMPT.encode() # Prompt as ASCII bytes, copied into the buffer with one slice assignment
 # line_buffer and current_prompt_row are no longer needed
 
-# --- NEW: Optimized Character Drawing ---
-def update_char_display(display, buffer, col, row, current_cursor_col, current_cursor_row):
-    """Draws the character at buffer[row][col] to the display,
-       inverting colors if it's the cursor position."""
-    # Basic bounds check
-    if not (0 <= row < SCREEN_CHAR_HEIGHT and 0 <= col < SCREEN_CHAR_WIDTH):
-        return 
-        
-    char = buffer[row][col]
-    is_cursor = (row == current_cursor_row and col == current_cursor_col)
-    fg = COLOR_BLACK if is_cursor else COLOR_WHITE
-    bg = COLOR_WHITE if is_cursor else COLOR_BLACK
-    
-    graphics.draw_char(display, char, 
-                       col * CHAR_WIDTH_PX, 
-                       row * CHAR_HEIGHT_PX, 
-                       fg, bg)
+# White-on-black glyphs plus their inverted (cursor) versions, rasterized once
+glyph_atlas = graphics.build_glyph_atlas(_COLOR_WHITE, _COLOR_BLACK)
+
+# --- Hardware Scrolling ---
+def scroll_up():
+    """Scrolls the text up one row with the ILI9488 VSCSAD register.
+
+    The panel rotates its own frame memory and the buffers are a ring that
+    rotates with it, so nothing is copied or resent: the old top row's slot
+    becomes the new bottom row, gets blanked, and only it is queued for redraw.
+    Pending dirty marks and drawn_buffer stay valid as they are.
+    """
+    global top_row
+    offset = ROW_OFFSET[top_row]
+    screen_buffer[offset:offset + SCREEN_CHAR_WIDTH] = BLANK_ROW
+    top_row = top_row + 1 if top_row < SCREEN_CHAR_HEIGHT - 1 else 0
+    display.set_scroll_start(ROW_Y[top_row])
+    # Queue the new bottom row; it is one contiguous buffer slot
+    offset = ROW_OFFSET[top_row + SCREEN_CHAR_HEIGHT - 1]
+    flags = dirty_flags
+    cells = dirty_cells
+    for idx in range(offset, offset + SCREEN_CHAR_WIDTH):
+        if not flags[idx]:
+            flags[idx] = 1
+            cells.append(idx)
+
+@micropython.viper
+def _row_unchanged(buf: ptr8, drawn: ptr8, start: int, count: int, cursor_idx: int) -> bool:
+    """True if drawn_buffer already holds this row (cursor bit included)."""
+    i = start
+    end = start + count
+    while i < end:
+        code = buf[i]
+        if i == cursor_idx:
+            code |= 0x80 # DRAWN_CURSOR_BIT
+        if drawn[i] != code:
+            return False
+        i += 1
+    return True
 
 # --- Modified Redraw Screen ---
 def redraw_screen(display, buffer, c_col, c_row):
     """Redraws the entire screen from the buffer, placing cursor.
-    NOTE: Full redraw can be slow, optimizations are possible. -> Now uses optimized draw
+    Each text row goes out as one atlas blit and SPI write (40 writes, not 1600).
+    Rows that drawn_buffer says are already on the panel are skipped.
     """
-    # graphics.clear_screen(display, COLOR_BLACK) # Optional: uncomment if flashing is acceptable
-    for r in range(SCREEN_CHAR_HEIGHT):
-        for c in range(SCREEN_CHAR_WIDTH):
-            # Use the new function to draw each character
-            update_char_display(display, buffer, c, r, c_col, c_row)
-
-# Clear the physical screen initially
-graphics.clear_screen(display, COLOR_BLACK)
+    # graphics.clear_screen(display, _COLOR_BLACK) # Optional: uncomment if flashing is acceptable
+    view = memoryview(buffer)
+    cursor_idx = ROW_OFFSET[top_row + c_row] + c_col
+    # Bind hot globals/attributes once for the row loop
+    draw_text = graphics.draw_cached_text
+    atlas = glyph_atlas
+    drawn = drawn_buffer
+    row_ys = ROW_Y
+    for r in range(SCREEN_CHAR_HEIGHT): # Buffer rows, each at its fixed frame y
+        start = r * SCREEN_CHAR_WIDTH
+        end = start + SCREEN_CHAR_WIDTH
+        if _row_unchanged(buffer, drawn, start, SCREEN_CHAR_WIDTH, cursor_idx):
+            continue
+        inverted_index = cursor_idx - start if start <= cursor_idx < end else -1
+        draw_text(display, atlas, view[start:end], inverted_index, 0, row_ys[r], _COLOR_BLACK)
+    drawn_buffer[:] = buffer
+    if 0 <= cursor_idx < len(drawn_buffer):
+        drawn_buffer[cursor_idx] |= DRAWN_CURSOR_BIT
+
+# Clear the physical screen initially. The fill runs in the background where
+# DMA is available; the first draw below waits for it to finish.
+display.fill_screen(_COLOR_BLACK, wait=False)
 
 # Initialize buffer (already done with spaces)
 # Draw the initial prompt into the buffer
-for i, char in enumerate(PROMPT):
-    if i < SCREEN_CHAR_WIDTH:
-        screen_buffer[cursor_row][i] = char
+screen_buffer[ROW_OFFSET[cursor_row]:ROW_OFFSET[cursor_row] + len(PROMPT)] = PROMPT_BYTES
 cursor_col = len(PROMPT) # Update cursor position after prompt
 
 # Initial screen draw from buffer
@@ -114,19 +192,100 @@ print("Shell initialized. Waiting for input...")
 # Define the valid Enter key codes (CR/LF is all we need now with corrected key handling)
 ENTER_KEY_CODES = [13]  # CR only since we standardized on CR in keyboard.py
 # Arrow key codes from keyboard reverse engineering
-ARROW_UP = 0xB5
-ARROW_DOWN = 0xB6
-ARROW_LEFT = 0xB4 # Define if needed later
-ARROW_RIGHT = 0xB7 # Define if needed later
+ARROW_UP = const(0xB5)
+ARROW_DOWN = const(0xB6)
+ARROW_LEFT = const(0xB4) # Define if needed later
+ARROW_RIGHT = const(0xB7) # Define if needed later
 BACKSPACE_KEYS = [8, 133] # ASCII BS and DEL
 
+# --- Dirty Cell Tracking ---
+# handle_key only records which cells changed; flush_dirty() repaints them,
+# so a burst of keys costs one repaint per touched cell rather than one per key.
+# These per-keystroke functions are compiled with @micropython.native.
+dirty_cells = [] # Flat buffer indices waiting to be repainted
+dirty_flags = bytearray(SCREEN_CHAR_WIDTH * SCREEN_CHAR_HEIGHT) # 1 if index already queued
+# Per-row span of columns that really changed, collected during a flush
+NO_SPAN = 0xFF
+row_dirty_lo = bytearray(b'\xff' * SCREEN_CHAR_HEIGHT) # NO_SPAN when the row is clean
+row_dirty_hi = bytearray(SCREEN_CHAR_HEIGHT)
+dirty_rows = []
+
+@micropython.native
+def mark_dirty(col, row):
+    """Queue the cell at (col, row) for repaint on the next flush."""
+    # Basic bounds check (e.g. a cursor parked past the last column)
+    if not (0 <= row < SCREEN_CHAR_HEIGHT and 0 <= col < SCREEN_CHAR_WIDTH):
+        return
+    idx = ROW_OFFSET[top_row + row] + col
+    if not dirty_flags[idx]:
+        dirty_flags[idx] = 1
+        dirty_cells.append(idx)
+
+@micropython.native
+def flush_dirty():
+    """Repaint every queued cell using the current cursor.
+
+    Cells whose character and cursor state match drawn_buffer are skipped, so
+    idempotent keystrokes (e.g. space over space) send nothing over SPI. The
+    remaining changes are coalesced per row into one [lo, hi] column span,
+    rendered from the glyph atlas and pushed with a single SPI write.
+    """
+    # Bind hot globals/attributes once for the loops below
+    draw_text = graphics.draw_cached_text
+    disp = display
+    atlas = glyph_atlas
+    buf = screen_buffer
+    view = screen_view
+    drawn = drawn_buffer
+    lo = row_dirty_lo
+    hi = row_dirty_hi
+    # A cursor outside the grid is not drawn (and must not alias the next row)
+    if 0 <= cursor_col < SCREEN_CHAR_WIDTH and 0 <= cursor_row < SCREEN_CHAR_HEIGHT:
+        cursor_idx = ROW_OFFSET[top_row + cursor_row] + cursor_col
+    else:
+        cursor_idx = -1
+    for idx in dirty_cells:
+        code = buf[idx] | (DRAWN_CURSOR_BIT if idx == cursor_idx else 0)
+        if drawn[idx] != code:
+            row = idx // SCREEN_CHAR_WIDTH
+            col = idx - row * SCREEN_CHAR_WIDTH
+            if lo[row] == NO_SPAN:
+                dirty_rows.append(row)
+                lo[row] = col
+                hi[row] = col
+            elif col < lo[row]:
+                lo[row] = col
+            elif col > hi[row]:
+                hi[row] = col
+    for row in dirty_rows:
+        start = row * SCREEN_CHAR_WIDTH + lo[row]
+        end = row * SCREEN_CHAR_WIDTH + hi[row] + 1
+        inverted_index = cursor_idx - start if start <= cursor_idx < end else -1
+        draw_text(disp, atlas, view[start:end], inverted_index,
+                  COL_X[lo[row]], ROW_Y[row], _COLOR_BLACK)
+        drawn[start:end] = view[start:end]
+        if inverted_index >= 0:
+            drawn[cursor_idx] |= DRAWN_CURSOR_BIT
+        lo[row] = NO_SPAN
+    dirty_rows.clear()
+    for idx in dirty_cells:
+        dirty_flags[idx] = 0
+    dirty_cells.clear()
+
 # --- Modified Handle Key ---
-def handle_key(key_code):
-    """Handle a key code from the keyboard using screen buffer"""
-    global cursor_col, cursor_row # screen_buffer is global implicitly
+@micropython.native
+def handle_key(key_code, defer_draw=False, _buf=screen_buffer, _W=SCREEN_CHAR_WIDTH,
+               _H=SCREEN_CHAR_HEIGHT, _PB=PROMPT_BYTES, _PL=len(PROMPT),
+               _view=screen_view, _mark=mark_dirty, _scroll=scroll_up,
+               _RO=ROW_OFFSET):
+    """Handle a key code from the keyboard using screen buffer.
+
+    Changed cells are queued with mark_dirty(); unless defer_draw is set they
+    are flushed before returning. The keyword defaults bind hot globals once at
+    definition time so the body uses fast local loads.
+    """
+    global cursor_col, cursor_row
     old_cursor_col, old_cursor_row = cursor_col, cursor_row
-    # REMOVED: needs_full_redraw = False (now handled differently)
-    needs_partial_update = False # Flag for general partial updates
 
     # --- Debug --- 
     if DEBUG_MODE:
@@ -142,188 +301,187 @@ def handle_key(key_code):
 
     # --- Printable Characters --- 
     if 32 <= key_code <= 126:
-        char = chr(key_code)
         # Only process if cursor is within bounds (before potential wrap/scroll)
-        if 0 <= cursor_row < SCREEN_CHAR_HEIGHT and 0 <= cursor_col < SCREEN_CHAR_WIDTH:
-            screen_buffer[cursor_row][cursor_col] = char # Update buffer *before* moving cursor
+        if 0 <= cursor_row < _H and 0 <= cursor_col < _W:
+            _buf[_RO[top_row + cursor_row] + cursor_col] = key_code # Update buffer *before* moving cursor
+            _mark(old_cursor_col, old_cursor_row) # Typed character replaces the old cursor cell
             cursor_col += 1
-            needs_partial_update = True # Update character and potentially old cursor pos
             # Handle line wrap
-            if cursor_col >= SCREEN_CHAR_WIDTH:
+            if cursor_col >= _W:
                 cursor_col = 0
                 cursor_row += 1
                 # Handle screen scroll (This should ideally not trigger here anymore for Enter)
-                if cursor_row >= SCREEN_CHAR_HEIGHT:
+                if cursor_row >= _H:
                     # If Enter caused scroll, it's handled below.
                     # If typing caused scroll (auto-wrap scroll):
                     # Perform scroll similar to Enter, but without command processing/prompt.
-                    # 1. Update Software Buffer
-                    screen_buffer.pop(0)
-                    screen_buffer.append([' ' for _ in range(SCREEN_CHAR_WIDTH)])
+                    # 1. Hardware scroll; only the new bottom row gets redrawn
+                    _scroll()
                     
                     # 2. Set Cursor Position (already wrapped, just fix row)
-                    cursor_row = SCREEN_CHAR_HEIGHT - 1
+                    cursor_row = _H - 1
                     # cursor_col is already 0 from wrap
-
-                    # 3. Perform Hardware Scroll
-                    current_scroll_start = display.get_scroll_start()
-                    next_scroll_start = (current_scroll_start + CHAR_HEIGHT_PX) % LCD_HEIGHT
-                    display.set_scroll_start(next_scroll_start)
-
-                    # 4. DIAGNOSTIC: Use full redraw instead of partial
-                    redraw_screen(display, screen_buffer, cursor_col, cursor_row)
-                    
-                    # No need for further partial update, we redrew the whole screen
-                    needs_partial_update = False 
+            _mark(cursor_col, cursor_row) # New cursor position
                     
     # --- Backspace --- 
     elif key_code in BACKSPACE_KEYS:
         # Determine if we *can* backspace (not in prompt area on first line)
-        can_move_back = (cursor_col > len(PROMPT) or cursor_row > 0)
+        can_move_back = (cursor_col > _PL or cursor_row > 0)
 
         if can_move_back:
-            # Redraw old cursor position first before moving it
-            update_char_display(display, screen_buffer, old_cursor_col, old_cursor_row, -1, -1) 
+            # Repaint old cursor position once it has moved
+            _mark(old_cursor_col, old_cursor_row)
             
             if cursor_col > 0:
                 # Move cursor back
                 cursor_col -= 1
                 # Erase character in buffer at the new cursor position
-                screen_buffer[cursor_row][cursor_col] = ' ' 
-                # Redraw the erased character position (now blank)
-                update_char_display(display, screen_buffer, cursor_col, cursor_row, -1, -1)
+                _buf[_RO[top_row + cursor_row] + cursor_col] = 0x20 # Space
             elif cursor_row > 0:
                 # Move cursor to end of previous line (don't erase)
                 cursor_row -= 1
                 # Find the effective end of the previous line (last non-space char)
-                effective_end_col = SCREEN_CHAR_WIDTH - 1
-                while effective_end_col >= 0 and screen_buffer[cursor_row][effective_end_col] == ' ':
+                effective_end_col = _W - 1
+                row_offset = _RO[top_row + cursor_row]
+                while effective_end_col >= 0 and _buf[row_offset + effective_end_col] == 0x20:
                     effective_end_col -= 1
                 cursor_col = effective_end_col + 1 # Place cursor after last char or at 0
                 # Prevent moving cursor into prompt on line 0 if it was empty/all spaces
-                if cursor_row == 0 and cursor_col < len(PROMPT):
-                     cursor_col = len(PROMPT)
+                if cursor_row == 0 and cursor_col < _PL:
+                     cursor_col = _PL
             
-            # Redraw the new cursor position
-            update_char_display(display, screen_buffer, cursor_col, cursor_row, cursor_col, cursor_row)
-            needs_partial_update = False # Handled manually above
+            # Repaint the new cursor position (also covers the erased cell)
+            _mark(cursor_col, cursor_row)
             
     # --- Enter --- 
     elif key_code in ENTER_KEY_CODES:
         # Extract command from the line where Enter was pressed (using old_cursor_row)
-        start_col = len(PROMPT) if old_cursor_row == 0 else 0
-        command = "".join(screen_buffer[old_cursor_row][start_col:]).rstrip() 
+        start_col = _PL if old_cursor_row == 0 else 0
+        row_offset = _RO[top_row + old_cursor_row]
+        # Scan back over trailing spaces, then decode straight from a buffer view:
+        # the command str is the only allocation (no join/rstrip/bytes copies)
+        end = row_offset + _W
+        start = row_offset + start_col
+        while end > start and _buf[end - 1] == 0x20:
+            end -= 1
+        command = str(_view[start:end], 'ascii')
         print(f"\nCommand: {command}") # Process the command here
 
-        # Redraw the old cursor position normally before moving
-        update_char_display(display, screen_buffer, old_cursor_col, old_cursor_row, -1, -1)
+        # Repaint the old cursor position normally once it has moved
+        _mark(old_cursor_col, old_cursor_row)
 
         # Calculate next row and check if scrolling is needed
         next_prompt_row = old_cursor_row + 1
         
         # --- SCROLLING LOGIC --- 
-        if next_prompt_row < SCREEN_CHAR_HEIGHT:
+        if next_prompt_row < _H:
             # --- NO SCROLL --- 
             cursor_row = next_prompt_row
             cursor_col = 0
-            # Write prompt to software buffer
-            for i, char in enumerate(PROMPT):
-                if i < SCREEN_CHAR_WIDTH:
-                    screen_buffer[cursor_row][i] = char
-            cursor_col = len(PROMPT)
-            # Draw the new prompt characters normally
-            for i, char in enumerate(PROMPT):
-                 draw_col = 0 + i
-                 if draw_col < SCREEN_CHAR_WIDTH:
-                     update_char_display(display, screen_buffer, draw_col, cursor_row, -1, -1)
-            # Draw the new cursor
-            update_char_display(display, screen_buffer, cursor_col, cursor_row, cursor_col, cursor_row)
-            needs_partial_update = False # Handled here
+            # Write prompt to software buffer (one slice copy) and queue its cells
+            row_offset = _RO[top_row + cursor_row]
+            _buf[row_offset:row_offset + _PL] = _PB
+            for i in range(_PL):
+                _mark(i, cursor_row)
+            cursor_col = _PL
+            # Queue the new cursor
+            _mark(cursor_col, cursor_row)
 
         else:
             # --- HARDWARE SCROLL REQUIRED --- 
-            # 1. Update Software Buffer (Keep this)
-            screen_buffer.pop(0)
-            screen_buffer.append([' ' for _ in range(SCREEN_CHAR_WIDTH)]) # Add new blank line at bottom
+            # 1. Rotate the ring and scroll the panel; the blank bottom row is queued for redraw
+            _scroll()
             
             # 2. Set Cursor Position (Keep this - cursor now on the new last line)
-            cursor_row = SCREEN_CHAR_HEIGHT - 1
+            cursor_row = _H - 1
             cursor_col = 0
             
             # 3. Write Prompt to software buffer (Keep this - updates the *new* last line)
-            for i, char in enumerate(PROMPT):
-                if i < SCREEN_CHAR_WIDTH:
-                    screen_buffer[cursor_row][i] = char
-            cursor_col = len(PROMPT) # Position cursor after prompt on the new last line
-            
-            # --- Perform Hardware Scroll ---
-            # Get current scroll start line (from display driver)
-            current_scroll_start = display.get_scroll_start() 
-            # Calculate next scroll line (wrapping around total height)
-            # Scroll UP by one character height
-            next_scroll_start = (current_scroll_start + CHAR_HEIGHT_PX) % LCD_HEIGHT 
-            display.set_scroll_start(next_scroll_start)
-            
-            # --- DIAGNOSTIC: Use full redraw instead of partial ---
-            redraw_screen(display, screen_buffer, cursor_col, cursor_row)
-            
-            # We have manually updated the screen, no further partial update needed
-            needs_partial_update = False 
-            # REMOVED: needs_full_redraw = True 
+            row_offset = _RO[top_row + cursor_row]
+            _buf[row_offset:row_offset + _PL] = _PB
+            cursor_col = _PL # Position cursor after prompt on the new last line
 
     # --- Arrow Up --- 
     elif key_code == ARROW_UP:
         if cursor_row > 0:
-            update_char_display(display, screen_buffer, old_cursor_col, old_cursor_row, -1, -1) # Undraw old cursor
+            _mark(old_cursor_col, old_cursor_row) # Undraw old cursor
             cursor_row -= 1
             # Prevent moving into prompt
-            if cursor_row == 0 and cursor_col < len(PROMPT):
-                cursor_col = len(PROMPT)
-            update_char_display(display, screen_buffer, cursor_col, cursor_row, cursor_col, cursor_row) # Draw new cursor
-            needs_partial_update = False # Handled manually
+            if cursor_row == 0 and cursor_col < _PL:
+                cursor_col = _PL
+            _mark(cursor_col, cursor_row) # Draw new cursor
 
     # --- Arrow Down --- 
     elif key_code == ARROW_DOWN:
-        if cursor_row < SCREEN_CHAR_HEIGHT - 1:
-            update_char_display(display, screen_buffer, old_cursor_col, old_cursor_row, -1, -1) # Undraw old cursor
+        if cursor_row < _H - 1:
+            _mark(old_cursor_col, old_cursor_row) # Undraw old cursor
             cursor_row += 1
             # Prevent moving into prompt (shouldn't happen when moving down, but safe)
-            if cursor_row == 0 and cursor_col < len(PROMPT):
-                cursor_col = len(PROMPT)
-            update_char_display(display, screen_buffer, cursor_col, cursor_row, cursor_col, cursor_row) # Draw new cursor
-            needs_partial_update = False # Handled manually
-
-    # --- Simplified Update Display ---
-    # Only needs to handle the case where a printable char was added
-    # All other cases now handle their own drawing updates.
-    if needs_partial_update:
-        # 1. Redraw the old cursor position without inversion 
-        update_char_display(display, screen_buffer, old_cursor_col, old_cursor_row, -1, -1) 
-        # 2. Redraw the character that was just typed (at old cursor pos)
-        update_char_display(display, screen_buffer, old_cursor_col, old_cursor_row, -1, -1) # Draw char normally
-        # 3. Redraw the new cursor position with inversion
-        update_char_display(display, screen_buffer, cursor_col, cursor_row, cursor_col, cursor_row) 
-
-    # REMOVED Final update block for needs_full_redraw
+            if cursor_row == 0 and cursor_col < _PL:
+                cursor_col = _PL
+            _mark(cursor_col, cursor_row) # Draw new cursor
+
+    if not defer_draw:
+        flush_dirty()
+
+def handle_keys(has_key, get_key):
+    """Apply every buffered key to the screen buffer, then repaint once.
+
+    has_key/get_key are the keyboard's bound methods. A burst of N keys (fast
+    typing, a held key) costs a single flush instead of N.
+
+    Returns:
+        bool: True if any key was handled.
+    """
+    handled_any = False
+    while has_key():
+        key = get_key()
+        if key is not None:
+            handle_key(key, defer_draw=True)
+            handled_any = True
+    if handled_any:
+        flush_dirty()
+    return handled_any
 
 # Main loop
 try:
     if DEBUG_MODE:
         print("Keyboard debugging mode: ON")
+
+    # Bind the keyboard methods once; the loop then avoids three attribute lookups per pass
+    if kbd:
+        scan_keyboard = kbd.scan_keyboard
+        has_key = kbd.has_key
+        get_key = kbd.get_key
     
     while True:
+        if kbd and KBD_INT_PIN is not None:
+            # Wait (WFI) for the INT edge, falling back to a scan after the timeout
+            idle_start = time.ticks_ms()
+            while not kbd_ready and time.ticks_diff(time.ticks_ms(), idle_start) < KBD_IDLE_TIMEOUT_MS:
+                machine.idle()
+            kbd_ready = False
+
         # Scan the keyboard (this updates the internal buffer)
         if kbd:
-            kbd.scan_keyboard()
+            if KBD_INT_PIN is not None:
+                # Each scan reads one FIFO entry, and INT can stay low while more
+                # are queued (no new edge), so read until the controller reports none
+                while scan_keyboard():
+                    pass
+            else:
+                scan_keyboard()
             
-            # Check if there's a key available
-            if kbd.has_key():
-                key = kbd.get_key()
-                if key is not None:
-                    handle_key(key)
+            # Drain every buffered key, then repaint once for the whole burst
+            if DEBUG_MODE:
+                burst_start = time.ticks_us()
+            if handle_keys(has_key, get_key):
+                if DEBUG_MODE:
+                    print(f"DEBUG: Keys + flush took {time.ticks_diff(time.ticks_us(), burst_start)} us")
         
-        # Small delay to prevent busy-waiting
-        time.sleep(0.02)  # 20ms delay (Increased slightly)
+        if KBD_INT_PIN is None or not kbd:
+            # Polling mode: small delay to prevent busy-waiting (integer ms, no float per pass)
+            time.sleep_ms(20)
         
 except KeyboardInterrupt:
     print("\nProgram terminated by user")
\ No newline at end of file
@@ -0,0 +1,20 @@
+# manifest.py - Freeze the PicoCalc shell modules into the MicroPython firmware
+#
+# Build (from a MicroPython checkout):
+#   make -C ports/rp2 BOARD=RPI_PICO FROZEN_MANIFEST=/path/to/this/manifest.py
+#
+# Frozen modules are compiled with mpy-cross at build time, so the Pico skips
+# parsing/compiling them at boot, and opt=3 folds const() values into callers.
+
+# Keep the standard modules shipped with the port (asyncio, etc.)
+include("$(PORT_DIR)/boards/manifest.py")
+
+# Modules imported by main.py
+module("font.py", opt=3)
+module("graphics.py", opt=3)
+module("ili9488.py", opt=3)
+module("keyboard.py", opt=3)
+
+# main.py is not frozen: the firmware only auto-runs main.py from the
+# filesystem, so it stays there as the entry point. Remove the .py copies of
+# the modules above from the Pico, since the filesystem shadows .frozen.